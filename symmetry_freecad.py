@@ -6,163 +6,384 @@ if freecad_path not in sys.path:
 
 import FreeCAD as App
 import Part
-import math
+import multiprocessing
 import numpy as np
+from dataclasses import dataclass, field
 # from PySide import QtCore
 
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
 
-def find_symmetric_face_pairs(shape, tolerance=0.01):
+# The distance kernels are compiled by numba when it is installed. The first
+# run compiles them (about 10 s) and stores the result next to this file, so
+# later sessions load them from that cache instead of compiling again
+try:
+    from numba import njit
+except ImportError:
+    # numba is not bundled with FreeCAD; fall back to running the kernels as plain NumPy
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+def find_symmetric_face_pairs(shape, tolerance=0.01, workers=1):
     """Identifies pairs of faces that are symmetric within tolerance"""
     faces = shape.Faces
     face_pairs = []
     
-    # Compare each face with all other faces
-    for i in range(len(faces)):
-        for j in range(i+1, len(faces)):
-            face_a = faces[i]
-            face_b = faces[j]
-            
-            # Quick filtering checks
-            # Compare areas
-            if abs(face_a.Area - face_b.Area) > tolerance:
-                continue
-                
-            # Compare perimeters
-            perimeter_a = sum(edge.Length for edge in face_a.Edges)
-            perimeter_b = sum(edge.Length for edge in face_b.Edges)
-            if abs(perimeter_a - perimeter_b) > tolerance:
-                continue
-            
-            # Check for potential mirror plane
-            center_a = face_a.CenterOfMass
-            center_b = face_b.CenterOfMass
-            
-            # Create midpoint between centers
-            midpoint = App.Vector((center_a.x + center_b.x)/2,
-                                 (center_a.y + center_b.y)/2,
-                                 (center_a.z + center_b.z)/2)
-            
-            # Create normal vector between centers
-            normal = center_b.sub(center_a)
-            if normal.Length < tolerance:
-                continue
-            normal.normalize()
-            
-            # Create mirror transformation
-            mirror_transform = App.Matrix()
-            mirror_transform.unity()
-            mirror_transform.A11 = 1 - 2*normal.x*normal.x
-            mirror_transform.A12 = -2*normal.x*normal.y
-            mirror_transform.A13 = -2*normal.x*normal.z
-            mirror_transform.A14 = 2*normal.x*midpoint.dot(normal)
-            mirror_transform.A21 = -2*normal.y*normal.x
-            mirror_transform.A22 = 1 - 2*normal.y*normal.y
-            mirror_transform.A23 = -2*normal.y*normal.z
-            mirror_transform.A24 = 2*normal.y*midpoint.dot(normal)
-            mirror_transform.A31 = -2*normal.z*normal.x
-            mirror_transform.A32 = -2*normal.z*normal.y
-            mirror_transform.A33 = 1 - 2*normal.z*normal.z
-            mirror_transform.A34 = 2*normal.z*midpoint.dot(normal)
-            
-            # Apply mirror transformation to face_a
-            mirrored_face = face_a.transformGeometry(mirror_transform)
-            
-            # Check if the mirrored face coincides with face_b
-            if check_faces_coincident(mirrored_face, face_b, tolerance):
-                face_pairs.append((i, j, midpoint, normal))
+    if len(faces) < 2:
+        return face_pairs
+    
+    # Gather the per-face invariants into arrays, touching each face once
+    areas = np.fromiter((face.Area for face in faces), float, len(faces))
+    perimeters = np.fromiter((sum(edge.Length for edge in face.Edges) for face in faces),
+                             float, len(faces))
+    centers = np.array([(c.x, c.y, c.z) for c in (face.CenterOfMass for face in faces)])
+    
+    # Symmetric faces must agree on both area and perimeter within tolerance
+    candidates = candidate_pairs(areas, perimeters, tolerance)
+    
+    # Mirror plane candidates: the perpendicular bisector of the two centers
+    valid, midpoints, normals, transforms = mirror_transforms(
+        centers[candidates[:, 0]], centers[candidates[:, 1]], tolerance)
+    candidates = candidates[valid]
+    
+    # Prepare each face once, ahead of the pair loop: only face_a of a pair
+    # is sampled and only face_b is tessellated, with the mesh well inside
+    # the tolerance, so no face does work that no pair uses
+    sampled = np.zeros(len(faces), dtype=bool)
+    sampled[candidates[:, 0]] = True
+    meshed = np.zeros(len(faces), dtype=bool)
+    meshed[candidates[:, 1]] = True
+    caches = {i: FaceCache.from_face(faces[i], tolerance / 4 if meshed[i] else None,
+                                     sample=sampled[i])
+              for i in np.flatnonzero(sampled | meshed).tolist()}
+    
+    # Check if the mirrored face_a coincides with face_b
+    tasks = [(i, j, transforms[k]) for k, (i, j) in enumerate(candidates.tolist())]
+    
+    # Starting a worker costs about as much as checking a few dozen pairs,
+    # so give each worker at least 50 pairs or stay serial
+    workers = min(workers, len(tasks) // 50)
+    if workers > 1:
+        # Compile or load the numba kernels here first, so every worker
+        # loads them from the on-disk cache instead of compiling them again
+        warm_up = np.zeros((1, 3))
+        points_on_mesh(warm_up, *[warm_up] * 5, tolerance, 0.7)
+        
+        # Part shapes do not pickle, so workers only get the cached arrays.
+        # Inside the FreeCAD GUI, point multiprocessing.set_executable() at
+        # FreeCAD's python first, or the pool would start FreeCAD itself
+        with multiprocessing.Pool(workers, initializer=init_pair_worker,
+                                  initargs=(caches, tolerance)) as pool:
+            matches = pool.map(check_pair_worker, tasks,
+                               chunksize=max(1, len(tasks) // (4 * workers)))
+    else:
+        matches = [check_faces_coincident(caches[i], caches[j], tolerance, transform)
+                   for i, j, transform in tasks]
+    
+    for k, (i, j) in enumerate(candidates.tolist()):
+        if matches[k]:
+            face_pairs.append((i, j, App.Vector(*midpoints[k]), App.Vector(*normals[k])))
     
     return face_pairs
 
-def check_faces_coincident(face1, face2, tolerance):
-    """Check if two faces coincide within tolerance after transformation"""
-    # Check if bounding boxes are similar
-    bb1 = face1.BoundBox
-    bb2 = face2.BoundBox
+def candidate_pairs(areas, perimeters, tolerance):
+    """Find the face index pairs (i, j), i < j, whose areas and perimeters agree within tolerance"""
+    descriptors = np.column_stack((areas, perimeters))
+    
+    if cKDTree is not None:
+        # Only look up neighbours in descriptor space (Chebyshev distance)
+        # instead of comparing each face with all other faces
+        tree = cKDTree(descriptors)
+        candidates = tree.query_pairs(r=tolerance, p=np.inf, output_type='ndarray')
+    else:
+        # Without scipy, bucket faces into tolerance-sized cells; faces within
+        # tolerance of each other fall in the same or a neighbouring cell
+        buckets = {}
+        for i, key in enumerate(np.floor(descriptors / tolerance).astype(np.int64).tolist()):
+            buckets.setdefault(tuple(key), []).append(i)
+        
+        candidates = []
+        for (key_area, key_perimeter), members in buckets.items():
+            neighbours = np.array([j for d_area in (-1, 0, 1) for d_perimeter in (-1, 0, 1)
+                                   for j in buckets.get((key_area + d_area, key_perimeter + d_perimeter), ())])
+            for i in members:
+                others = neighbours[neighbours > i]
+                close = np.abs(descriptors[others] - descriptors[i]).max(axis=1) <= tolerance
+                candidates.extend((i, j) for j in others[close].tolist())
+        candidates = np.array(candidates, dtype=np.intp).reshape(-1, 2)
+    
+    # Visit pairs in (i, j) order, as a plain double loop would
+    return candidates[np.lexsort((candidates[:, 1], candidates[:, 0]))]
+
+def mirror_transforms(centers_a, centers_b, tolerance):
+    """Build the reflections mapping each of centers_a onto the matching centers_b"""
+    midpoints = 0.5 * (centers_a + centers_b)
+    
+    # Normal vectors between centers; coincident centers give no plane
+    normals = centers_b - centers_a
+    lengths = np.linalg.norm(normals, axis=1)
+    valid = lengths >= tolerance
+    midpoints = midpoints[valid]
+    normals = normals[valid] / lengths[valid, None]
+    
+    # Householder reflection about the plane n.x = d through the midpoint:
+    # x' = (I - 2nn^T)x + 2dn, stacked as (K, 4, 4) matrices
+    offsets = np.einsum('ij,ij->i', midpoints, normals)
+    transforms = np.zeros((len(normals), 4, 4))
+    transforms[:, :3, :3] = np.eye(3) - 2 * np.einsum('ki,kj->kij', normals, normals)
+    transforms[:, :3, 3] = 2 * offsets[:, None] * normals
+    transforms[:, 3, 3] = 1
+    
+    return valid, midpoints, normals, transforms
+
+@dataclass
+class FaceCache:
+    """Sample points and mesh of a face, computed once and reused for every pair"""
+    vertices: np.ndarray
+    edge_samples: np.ndarray
+    mesh: tuple
+    plane: tuple = None  # (origin, unit normal) for planar faces
+    points: np.ndarray = field(init=False)
+    bounds: tuple = field(init=False)  # (lower, upper) corners of the mesh
+    
+    def __post_init__(self):
+        # Vertices first, they decide most pairs
+        self.points = np.concatenate((self.vertices, self.edge_samples))
+        lower, upper = self.mesh[3], self.mesh[4]
+        self.bounds = (lower.min(axis=0, initial=np.inf), upper.max(axis=0, initial=-np.inf))
+    
+    @classmethod
+    def from_face(cls, face, deviation=None, samples_per_edge=5, sample=True):
+        """Sample the face if sample is set, and tessellate it if a deviation is given"""
+        empty = np.empty((0, 3))
+        vertices, edge_samples = face_samples(face, samples_per_edge) if sample else (empty, empty)
+        if deviation is None:
+            return cls(vertices, edge_samples, (empty,) * 5)
+        
+        plane = None
+        if isinstance(face.Surface, Part.Plane):
+            origin, axis = face.Surface.Position, face.Surface.Axis
+            plane = (np.array([origin.x, origin.y, origin.z]), np.array([axis.x, axis.y, axis.z]))
+        return cls(vertices, edge_samples, face_mesh(face, deviation), plane)
+
+def face_samples(face, samples_per_edge=5):
+    """Sample a face by its vertices and points along its edges"""
+    # Use vertices and edge points instead of parameter range
+    vertices = [vertex.Point for vertex in face.Vertexes]
+    
+    # Sample points on edges, skipping degenerated edges (such as a cone apex)
+    # that have no curve; one discretize call per edge returns all its
+    # interior samples, equally spaced, instead of one valueAt per point
+    edge_samples = []
+    for edge in face.Edges:
+        if edge.Degenerated:
+            continue
+        edge_samples.extend(edge.discretize(Number=samples_per_edge + 1)[1:-1])
+    
+    return (np.array([(p.x, p.y, p.z) for p in vertices]).reshape(-1, 3),
+            np.array([(p.x, p.y, p.z) for p in edge_samples]).reshape(-1, 3))
+
+def face_mesh(face, deviation):
+    """Tessellate a face into triangles given as corner v0, edges e1, e2 and their bounding boxes"""
+    points, triangles = face.tessellate(deviation)
+    vertices = np.array([(p.x, p.y, p.z) for p in points]).reshape(-1, 3)
+    triangles = np.array(triangles, dtype=np.intp).reshape(-1, 3)
+    
+    corners = vertices[triangles]
+    v0 = corners[:, 0]
+    return (v0, corners[:, 1] - v0, corners[:, 2] - v0,
+            corners.min(axis=1), corners.max(axis=1))
+
+@njit(fastmath=True, cache=True)
+def point_mesh_distance(p, v0, e1, e2):
+    """Distance from point p to the closest of the triangles (v0, v0 + e1, v0 + e2)"""
+    # Closest point on every triangle as v0 + v*e1 + w*e2, picking the
+    # Voronoi region of p as in Ericson's ClosestPtPointTriangle
+    ap = p - v0
+    d1 = (e1 * ap).sum(axis=1)
+    d2 = (e2 * ap).sum(axis=1)
+    d3 = d1 - (e1 * e1).sum(axis=1)
+    d4 = d2 - (e2 * e1).sum(axis=1)
+    d5 = d1 - (e1 * e2).sum(axis=1)
+    d6 = d2 - (e2 * e2).sum(axis=1)
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+    
+    # Regions from lowest to highest precedence, so later ones win:
+    # face interior, edges BC, AC, vertex C, edge AB, vertices B and A.
+    # Zero denominators only occur outside their region; adding the
+    # (denom == 0) mask keeps the division finite
+    denom = va + vb + vc
+    denom = denom + (denom == 0)
+    v = vb / denom
+    w = vc / denom
+    
+    denom = (d4 - d3) + (d5 - d6)
+    t = (d4 - d3) / (denom + (denom == 0))
+    region = (va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0)
+    v[region] = 1 - t[region]
+    w[region] = t[region]
+    
+    denom = d2 - d6
+    t = d2 / (denom + (denom == 0))
+    region = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+    v[region] = 0
+    w[region] = t[region]
+    
+    region = (d6 >= 0) & (d5 <= d6)
+    v[region] = 0
+    w[region] = 1
+    
+    denom = d1 - d3
+    t = d1 / (denom + (denom == 0))
+    region = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+    v[region] = t[region]
+    w[region] = 0
+    
+    region = (d3 >= 0) & (d4 <= d3)
+    v[region] = 1
+    w[region] = 0
+    
+    region = (d1 <= 0) & (d2 <= 0)
+    v[region] = 0
+    w[region] = 0
+    
+    offset = ap - v.reshape(-1, 1) * e1 - w.reshape(-1, 1) * e2
+    return np.sqrt((offset * offset).sum(axis=1).min())
+
+@njit(fastmath=True, cache=True)
+def points_on_mesh(points, v0, e1, e2, lower, upper, tolerance, ratio):
+    """Check if more than ratio of the points lie within tolerance of a mesh"""
+    # Stop as soon as enough points have matched or too many have missed;
+    # the points start with the face vertices, which decide most pairs
+    need = int(ratio * len(points)) + 1
+    max_fail = len(points) - need
+    match_count = 0
+    fail_count = 0
+    for k in range(len(points)):
+        # Only triangles whose box, grown by tolerance, holds the point can
+        # be within tolerance of it; no such triangle means a miss
+        p = points[k]
+        near = ((lower[:, 0] <= p[0] + tolerance) & (upper[:, 0] >= p[0] - tolerance)
+                & (lower[:, 1] <= p[1] + tolerance) & (upper[:, 1] >= p[1] - tolerance)
+                & (lower[:, 2] <= p[2] + tolerance) & (upper[:, 2] >= p[2] - tolerance))
+        if near.any() and point_mesh_distance(p, v0[near], e1[near], e2[near]) < tolerance:
+            match_count += 1
+            if match_count >= need:
+                return True
+        else:
+            fail_count += 1
+            if fail_count > max_fail:
+                return False
+    return False
+
+def check_faces_coincident(face1, face2, tolerance, transform=None):
+    """Check if two cached faces coincide within tolerance after transforming face1"""
+    points = face1.points
+    if transform is not None:
+        points = points @ transform[:3, :3].T + transform[:3, 3]
     
-    if (abs(bb1.DiagonalLength - bb2.DiagonalLength) > tolerance):
+    if len(points) == 0 or len(face2.mesh[0]) == 0:
         return False
     
-    # Use vertices and edge points instead of parameter range
-    points_to_check = []
-    
-    # Add vertices
-    for vertex in face1.Vertexes:
-        points_to_check.append(vertex.Point)
-    
-    # Sample points on edges
-    samples_per_edge = 5
-    for edge in face1.Edges:
-        for i in range(1, samples_per_edge):
-            param = edge.FirstParameter + (i/samples_per_edge) * (edge.LastParameter - edge.FirstParameter)
-            try:
-                points_to_check.append(edge.valueAt(param))
-            except:
-                continue
-    
-    if not points_to_check:
+    # A point can only be near a face if it is inside the face's mesh box
+    # grown by tolerance, which rules out most pairs before the mesh
+    lower, upper = face2.bounds
+    inside = ((points >= lower - tolerance) & (points <= upper + tolerance)).all(axis=1)
+    if np.count_nonzero(inside) <= 0.7 * len(points):
         return False
     
-    # Check how many points are close to face2
-    match_count = 0
-    for point in points_to_check:
-        try:
-            distance = face2.distToShape(Part.Vertex(point))[0]
-            if distance < tolerance:
-                match_count += 1
-        except:
-            pass
+    # Likewise a point can only be near a planar face if it is near its
+    # plane, which rules out most remaining planar pairs with a dot product
+    if face2.plane is not None:
+        origin, normal = face2.plane
+        near_plane = np.abs((points - origin) @ normal) < tolerance
+        if np.count_nonzero(near_plane) <= 0.7 * len(points):
+            return False
     
     # If more than 70% of points match, consider the faces coincident
-    return match_count > 0.7 * len(points_to_check)
+    return points_on_mesh(points, *face2.mesh, tolerance, 0.7)
 
     
     # # If more than 70% of points match, consider the faces coincident
     # return match_count > 0.7 * samples * samples
 
+_worker_state = {}
+
+def init_pair_worker(caches, tolerance):
+    """Store the face caches once per worker process"""
+    _worker_state['caches'] = caches
+    _worker_state['tolerance'] = tolerance
+
+def check_pair_worker(task):
+    """Run check_faces_coincident for one (i, j, transform) candidate in a worker"""
+    i, j, transform = task
+    caches = _worker_state['caches']
+    return check_faces_coincident(caches[i], caches[j], _worker_state['tolerance'], transform)
+
+def group_pairs_by_normal(face_pairs):
+    """Group face pairs whose mirror plane normals are nearly parallel"""
+    normals = np.array([(n.x, n.y, n.z) for _, _, _, n in face_pairs])
+    ungrouped = np.ones(len(face_pairs), dtype=bool)
+    plane_groups = []
+    
+    # Each group is led by its first pair, and a pair joins the first group
+    # whose leading normal it matches, so take the earliest ungrouped pair as
+    # the next leader and claim every ungrouped pair close to it at once
+    while ungrouped.any():
+        leader = np.argmax(ungrouped)
+        members = ungrouped & (np.abs(normals @ normals[leader]) > 0.98)  # Within ~11 degrees
+        members[leader] = True  # Even if its normal is zero or NaN
+        plane_groups.append([face_pairs[k] for k in np.flatnonzero(members)])
+        ungrouped &= ~members
+    
+    return plane_groups
+
+def average_plane(group):
+    """Average the midpoints and normals of a group of face pairs"""
+    points = np.array([(p.x, p.y, p.z) for _, _, p, _ in group])
+    normals = np.array([(n.x, n.y, n.z) for _, _, _, n in group])
+    
+    # Normals of one group may point either way; flip them to agree with
+    # the first one so opposite normals do not cancel out
+    normals *= np.where(normals @ normals[0] < 0, -1.0, 1.0)[:, None]
+    avg_normal = normals.mean(axis=0)
+    avg_normal /= np.linalg.norm(avg_normal)
+    
+    return App.Vector(*points.mean(axis=0)), App.Vector(*avg_normal)
+
+def face_membership(plane_groups, total_faces):
+    """Mark the faces paired up in each group, as a (groups, faces) boolean mask"""
+    mask = np.zeros((len(plane_groups), total_faces), dtype=bool)
+    rows = np.repeat(np.arange(len(plane_groups)), [len(group) for group in plane_groups])
+    pairs = np.array([(i, j) for group in plane_groups for i, j, _, _ in group],
+                     dtype=np.intp).reshape(-1, 2)
+    mask[rows, pairs[:, 0]] = True
+    mask[rows, pairs[:, 1]] = True
+    return mask
+
 def find_significant_mirror_plane(face_pairs, total_faces):
     """Determine if there's a significant mirror plane from the face pairs"""
     if not face_pairs:
         return None, "No symmetrical faces found"
     
     # Group face pairs by similar plane normals
-    plane_groups = []
-    
-    for pair in face_pairs:
-        i, j, midpoint, normal = pair
-        
-        # Find if this normal is similar to an existing group
-        found_group = False
-        for group in plane_groups:
-            group_normal = group[0][3]  # Normal of first pair in group
-            if abs(normal.dot(group_normal)) > 0.98:  # Within ~11 degrees
-                group.append(pair)
-                found_group = True
-                break
-        
-        if not found_group:
-            plane_groups.append([pair])
+    plane_groups = group_pairs_by_normal(face_pairs)
     
     # Find the largest group
     largest_group = max(plane_groups, key=len)
     
     # Calculate average normal and position
-    avg_normal = App.Vector(0, 0, 0)
-    avg_point = App.Vector(0, 0, 0)
-    
-    for pair in largest_group:
-        avg_normal += pair[3]
-        avg_point += pair[2]
-    
-    avg_normal.normalize()
-    avg_point.multiply(1.0/len(largest_group))
+    avg_point, avg_normal = average_plane(largest_group)
     
     # Determine if this is significant symmetry
-    unique_faces = set()
-    for i, j, _, _ in largest_group:
-        unique_faces.add(i)
-        unique_faces.add(j)
-    
-    coverage = len(unique_faces) / total_faces
+    coverage = face_membership([largest_group], total_faces)[0].sum() / total_faces
     
     if coverage < 0.2:
         return None, "No significant symmetry detected"
@@ -171,6 +392,25 @@ def find_significant_mirror_plane(face_pairs, total_faces):
     else:
         return (avg_point, avg_normal), "Full symmetry detected"
 
+def plane_basis(normals):
+    """Two orthogonal unit vectors spanning each plane with the given unit normals"""
+    # Cross with the axis least aligned with each normal, so it never degenerates
+    axes = np.zeros_like(normals)
+    np.put_along_axis(axes, np.argmin(np.abs(normals), axis=-1)[..., None], 1, axis=-1)
+    ortho1 = np.cross(normals, axes)
+    ortho1 /= np.linalg.norm(ortho1, axis=-1, keepdims=True)
+    
+    # Already unit length, as each normal and ortho1 are orthogonal unit vectors
+    ortho2 = np.cross(normals, ortho1)
+    return ortho1, ortho2
+
+def plane_corners(points, normals, size):
+    """Corners of the size x size squares centered on each plane, as a (K, 4, 3) array"""
+    ortho1, ortho2 = plane_basis(normals)
+    signs = np.array([(1, 1), (-1, 1), (-1, -1), (1, -1)]) * size/2
+    return (points[:, None] + signs[:, 0, None] * ortho1[:, None]
+            + signs[:, 1, None] * ortho2[:, None])
+
 def visualize_mirror_plane(doc, shape, mirror_plane, face_pairs):
     """Visualize the mirror plane and highlighted paired faces"""
     if not mirror_plane:
@@ -182,21 +422,10 @@ def visualize_mirror_plane(doc, shape, mirror_plane, face_pairs):
     bbox = shape.BoundBox
     size = max(bbox.XLength, bbox.YLength, bbox.ZLength) * 1.2
     
-    # Create orthogonal vectors to the normal
-    if abs(normal.x) > 0.1 or abs(normal.y) > 0.1:
-        ortho1 = App.Vector(-normal.y, normal.x, 0).normalize()
-    else:
-        ortho1 = App.Vector(0, -normal.z, normal.y).normalize()
-    
-    ortho2 = normal.cross(ortho1).normalize()
-    
     # Create four corners of the plane
-    corners = [
-        point.add(ortho1.multiply(size/2).add(ortho2.multiply(size/2))),
-        point.add(ortho1.multiply(-size/2).add(ortho2.multiply(size/2))),
-        point.add(ortho1.multiply(-size/2).add(ortho2.multiply(-size/2))),
-        point.add(ortho1.multiply(size/2).add(ortho2.multiply(-size/2)))
-    ]
+    corners = plane_corners(np.array([[point.x, point.y, point.z]]),
+                            np.array([[normal.x, normal.y, normal.z]]), size)[0]
+    corners = [App.Vector(*corner) for corner in corners]
     
     # Create mirror plane
     wire = Part.makePolygon([corners[0], corners[1], corners[2], corners[3], corners[0]])
@@ -281,55 +510,26 @@ def find_all_mirror_planes(face_pairs, total_faces):
         return [], "No symmetrical faces found"
     
     # Group face pairs by similar plane normals
-    plane_groups = []
+    plane_groups = group_pairs_by_normal(face_pairs)
     
-    for pair in face_pairs:
-        i, j, midpoint, normal = pair
-        
-        # Find if this normal is similar to an existing group
-        found_group = False
-        for group in plane_groups:
-            group_normal = group[0][3]  # Normal of first pair in group
-            if abs(normal.dot(group_normal)) > 0.98:  # Within ~11 degrees
-                group.append(pair)
-                found_group = True
-                break
-        
-        if not found_group:
-            plane_groups.append([pair])
+    # Only consider groups with at least 2 face pairs
+    plane_groups = [group for group in plane_groups if len(group) >= 2]
+    
+    # Count the faces each plane pairs up, for all planes at once
+    face_counts = face_membership(plane_groups, total_faces).sum(axis=1)
     
     # Calculate average planes for each group
     mirror_planes = []
-    for group in plane_groups:
-        # Only consider groups with at least 2 face pairs
-        if len(group) < 2:
-            continue
-            
+    for group, face_count in zip(plane_groups, face_counts.tolist()):
         # Calculate average normal and position
-        avg_normal = App.Vector(0, 0, 0)
-        avg_point = App.Vector(0, 0, 0)
-        
-        for pair in group:
-            avg_normal += pair[3]
-            avg_point += pair[2]
-        
-        avg_normal.normalize()
-        avg_point.multiply(1.0/len(group))
-        
-        # Determine coverage for this plane
-        unique_faces = set()
-        for i, j, _, _ in group:
-            unique_faces.add(i)
-            unique_faces.add(j)
-        
-        coverage = len(unique_faces) / total_faces
+        avg_point, avg_normal = average_plane(group)
         
         # Store the plane information with its coverage and face pairs
         mirror_planes.append({
             'plane': (avg_point, avg_normal),
-            'coverage': coverage,
+            'coverage': face_count / total_faces,
             'pairs': group,
-            'face_count': len(unique_faces)
+            'face_count': face_count
         })
     
     # Sort planes by coverage (highest first)
@@ -363,29 +563,19 @@ def visualize_all_mirror_planes(doc, shape, mirror_planes):
     # Create a group to hold all mirror planes
     planes_group = doc.addObject("App::DocumentObjectGroup", "MirrorPlanes")
     
+    # Corners of every plane and the tips of their normal indicators, all at once
+    points = np.array([(p.x, p.y, p.z) for p, _ in (data['plane'] for data in mirror_planes)])
+    normals = np.array([(n.x, n.y, n.z) for _, n in (data['plane'] for data in mirror_planes)])
+    all_corners = plane_corners(points, normals, size)
+    label_points = points + normals * size/10
+    
     # Process each mirror plane
     for idx, mirror_plane_data in enumerate(mirror_planes):
-        point, normal = mirror_plane_data['plane']
         color_idx = idx % len(color_palette)
         
-        # Create orthogonal vectors to the normal
-        if abs(normal.x) > 0.1 or abs(normal.y) > 0.1:
-            ortho1 = App.Vector(-normal.y, normal.x, 0).normalize()
-        else:
-            ortho1 = App.Vector(0, -normal.z, normal.y).normalize()
-        
-        ortho2 = normal.cross(ortho1).normalize()
-        
-        # Create four corners of the plane
-        corners = [
-            point.add(ortho1.multiply(size/2).add(ortho2.multiply(size/2))),
-            point.add(ortho1.multiply(-size/2).add(ortho2.multiply(size/2))),
-            point.add(ortho1.multiply(-size/2).add(ortho2.multiply(-size/2))),
-            point.add(ortho1.multiply(size/2).add(ortho2.multiply(-size/2)))
-        ]
-        
         # Create mirror plane
-        wire = Part.makePolygon([corners[0], corners[1], corners[2], corners[3], corners[0]])
+        corners = [App.Vector(*corner) for corner in all_corners[idx]]
+        wire = Part.makePolygon(corners + corners[:1])
         face = Part.Face(wire)
         
         # Add plane with useful name containing coverage info
@@ -401,8 +591,7 @@ def visualize_all_mirror_planes(doc, shape, mirror_planes):
             mirror_obj.ViewObject.Transparency = 60
         
         # Add a label to show normal direction
-        label_point = point.add(normal.multiply(size/10))
-        line = Part.LineSegment(point, label_point).toShape()
+        line = Part.LineSegment(App.Vector(*points[idx]), App.Vector(*label_points[idx])).toShape()
         normal_indicator = doc.addObject("Part::Feature", f"Normal_{idx+1}")
         normal_indicator.Shape = line
         planes_group.addObject(normal_indicator)